@@ -1,18 +1,20 @@
 """
 Generate synthetic raw marketing data and save it to the bronze layer.
 
-This script creates synthetic marketing data using Faker, including customer details,
-campaign metrics, and timestamps. The data is saved in Parquet and CSV formats in the
-`data/bronze` directory.
+This script creates synthetic marketing data with NumPy, including customer details,
+campaign metrics, and timestamps. The data is saved in Parquet format (and CSV when
+`WRITE_CSV` is set) in the `data/bronze` directory.
 """
 
 import logging
 import os
 from datetime import datetime
-import random
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-from faker import Faker
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 # Configure logging
 logging.basicConfig(
@@ -21,16 +23,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Faker
-fake = Faker()
-
 # Configuration constants
 NUM_CUSTOMERS = [5000]
 OUTPUT_DIR = "data/bronze"
+WRITE_CSV = os.getenv("WRITE_CSV", "false").lower() in ("1", "true", "yes")  # CSV is opt-in
 CAMPAIGN_IDS = [
     "92c14ef8-a59a-4a78-9670-9e527d9947a1",
     "4c967788-de7b-4626-bbca-c7e7144da864",
 ]
+GENDERS = ["M", "F"]
 CAMPAIGN_CHANNELS = ["email", "social_media", "search", "display"]
 CAMPAIGN_TYPES = ["product_launch"]
 ADVERTISING_PLATFORMS = ["Google Ads", "Facebook Ads", "Instagram Ads", "Email Campaign"]
@@ -43,6 +44,32 @@ CHANNEL_TO_PLATFORM = {
     "display": ["Google Ads", "Facebook Ads", "Instagram Ads"]
 }
 
+# Impressions (inclusive bounds) and click-through rate per campaign_channel
+CHANNEL_IMPRESSIONS = {
+    "email": (1, 15),
+    "social_media": (5, 25),
+    "search": (1, 10),
+    "display": (5, 35),
+}
+CHANNEL_CTR = {
+    "display": 0.01,
+    "social_media": 0.05,
+    "email": 0.12,
+    "search": 0.08
+}
+
+# Lookup tables indexed by a channel's position in CAMPAIGN_CHANNELS
+IMPRESSION_BOUNDS = np.array(
+    [CHANNEL_IMPRESSIONS[c] for c in CAMPAIGN_CHANNELS], dtype=np.int16
+)
+CTR_BY_CHANNEL = np.array([CHANNEL_CTR[c] for c in CAMPAIGN_CHANNELS])
+PLATFORM_COUNTS = np.array([len(CHANNEL_TO_PLATFORM[c]) for c in CAMPAIGN_CHANNELS])
+PLATFORM_CODES = np.array([
+    [ADVERTISING_PLATFORMS.index(p) for p in CHANNEL_TO_PLATFORM[c]]
+    + [-1] * (PLATFORM_COUNTS.max() - len(CHANNEL_TO_PLATFORM[c]))
+    for c in CAMPAIGN_CHANNELS
+], dtype=np.int8)
+
 # Revenue values for conversions
 REVENUE_VALUES = [300, 500, 800, 1200, 2000]
 
@@ -56,112 +83,166 @@ COST_PER_EMAIL = 0.20  # Cost per email sent
 CPM_SOCIAL_DISPLAY = 49.34  # Cost per thousand impressions (Meta/Google)
 CPC_SEARCH = 22.23  # Cost per click (Google Ads)
 
-def generate_raw_data(num_customers: int, output_dir: str) -> None:
-    """Generate synthetic marketing data and save to bronze layer."""
+# Share of clicks that turn into website visits
+VISIT_RATE_RANGE = (0.6, 0.85)
+
+# Row count from which generation is sharded across worker processes
+PARALLEL_MIN_ROWS = 100_000
+
+# Parquet write settings (zstd, dictionary-encoded strings, ~64k-row groups)
+PARQUET_WRITE_OPTIONS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "row_group_size": 64_000,
+    "data_page_size": 1 << 20,
+    "write_statistics": True,
+}
+
+def _uuid4_hex(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Return `n` random version-4 UUIDs as 32-character hex strings, drawn from `rng`."""
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    return np.frombuffer(raw.tobytes().hex().encode("ascii"), dtype="S32").astype("U32")
+
+def _draw_categorical(rng: np.random.Generator, categories: list[str], n: int) -> pd.Categorical:
+    """Draw `n` values uniformly from `categories` as category codes, without building strings."""
+    codes = rng.integers(0, len(categories), n, dtype=np.int8)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def _gen_chunk(n: int, seed: np.random.SeedSequence) -> pd.DataFrame:
+    """Generate one shard of synthetic marketing records.
+
+    Every field is drawn column-wise with a NumPy generator seeded from `seed`,
+    so shards never share a stream.
+    """
+    rng = np.random.default_rng(seed)
+
+    customer_id = _uuid4_hex(rng, n)
+    age = rng.integers(AGE_RANGE[0], AGE_RANGE[1] + 1, n, dtype=np.int8)
+    gender = _draw_categorical(rng, GENDERS, n)
+    income = rng.uniform(*INCOME_RANGE, n).round(2).astype(np.float32)
+    campaign_id = _draw_categorical(rng, CAMPAIGN_IDS, n)
+    channel = rng.integers(0, len(CAMPAIGN_CHANNELS), n, dtype=np.int8)
+    campaign_channel = pd.Categorical.from_codes(channel, categories=CAMPAIGN_CHANNELS)
+    campaign_type = _draw_categorical(rng, CAMPAIGN_TYPES, n)
+
+    # Select advertising_platform based on campaign_channel
+    platform = PLATFORM_CODES[channel, rng.integers(0, PLATFORM_COUNTS[channel])]
+    advertising_platform = pd.Categorical.from_codes(platform, categories=ADVERTISING_PLATFORMS)
+
+    # Impressions vary by channel
+    bounds = IMPRESSION_BOUNDS[channel]
+    impressions = rng.integers(bounds[:, 0], bounds[:, 1] + 1, dtype=np.int16)
+
+    # Clicks based on channel-specific CTR
+    clicks = rng.binomial(impressions, CTR_BY_CHANNEL[channel]).astype(np.int16)
+
+    # Previous purchases
+    previous_purchases = rng.integers(0, 3, n, dtype=np.int8)
+
+    # Dates
+    date_range_seconds = int((DATE_END - DATE_START).total_seconds())
+    date_received = (
+        pd.Timestamp(DATE_START)
+        + pd.to_timedelta(rng.integers(0, date_range_seconds, n), unit="s")
+    ).to_numpy(dtype="datetime64[ns]")
+
+    # Website visits: 60–85% of clicks. Every click visits with its own
+    # U(0.6, 0.85) probability, which is a Bernoulli draw at the range mean.
+    visit_rate = sum(VISIT_RATE_RANGE) / 2
+    website_visits = rng.binomial(clicks, visit_rate).astype(np.int16)
+    has_visits = website_visits > 0
+
+    # Time on site (seconds) if there are visits
+    time_on_site = np.where(
+        has_visits, rng.integers(60, 601, n, dtype=np.int16), 0
+    ).astype(np.int16)
+
+    # Conversions: 3% chance if there are visits
+    converted = has_visits & (rng.random(n) < 0.03)
+    conversions = np.where(
+        converted, rng.choice(np.array([1, 2], dtype=np.int8), n, p=[0.85, 0.15]), 0
+    ).astype(np.int8)
+
+    # Revenue based on conversions and ticket value
+    revenue = (
+        conversions * rng.choice(np.array(REVENUE_VALUES, dtype=np.int16), n)
+    ).astype(np.int16)
+
+    # Ad spend based on channel
+    ad_spend = np.select(
+        [
+            channel == CAMPAIGN_CHANNELS.index("email"),
+            channel == CAMPAIGN_CHANNELS.index("search"),
+        ],
+        [impressions * COST_PER_EMAIL, clicks * CPC_SEARCH],
+        default=(impressions / 1000) * CPM_SOCIAL_DISPLAY,  # social_media and display
+    ).round(2).astype(np.float32)
+
+    # Low-cardinality strings are categoricals with fixed categories, so shards
+    # concatenate without falling back to object dtype
+    data = {
+        "customer_id": customer_id,
+        "age": age,
+        "gender": gender,
+        "income": income,
+        "campaign_id": campaign_id,
+        "campaign_channel": campaign_channel,
+        "campaign_type": campaign_type,
+        "ad_spend": ad_spend,
+        "impressions": impressions,
+        "clicks": clicks,
+        "conversions": conversions,
+        "revenue": revenue,
+        "website_visits": website_visits,
+        "time_on_site": time_on_site,
+        "previous_purchases": previous_purchases,
+        "date_received": date_received,
+        "advertising_platform": advertising_platform,
+    }
+    return pd.DataFrame(data, copy=False)
+
+
+def generate_raw_data(num_customers: int, output_dir: str, seed: int | None = None) -> None:
+    """Generate synthetic marketing data and save to bronze layer.
+
+    Large runs are split into one shard per CPU and generated in worker
+    processes, each with its own child of `seed`.
+    """
     logger.info(f"Generating {num_customers} customer records...")
-    data = []
-
-    for i in range(num_customers):
-        customer_id = fake.uuid4()
-        age = random.randint(*AGE_RANGE)
-        gender = random.choice(["M", "F"])
-        income = round(random.uniform(*INCOME_RANGE), 2)
-        campaign_id = random.choice(CAMPAIGN_IDS)
-        campaign_channel = random.choice(CAMPAIGN_CHANNELS)
-        campaign_type = random.choice(CAMPAIGN_TYPES)
-
-        # Select advertising_platform based on campaign_channel
-        advertising_platform = random.choice(CHANNEL_TO_PLATFORM[campaign_channel])
-
-        # Impressions vary by channel
-        if campaign_channel == "display":
-            impressions = random.randint(5, 35)
-        elif campaign_channel == "social_media":
-            impressions = random.randint(5, 25)
-        elif campaign_channel == "email":
-            impressions = random.randint(1, 15)
-        else:  # search
-            impressions = random.randint(1, 10)
-
-        # Clicks based on channel-specific CTR
-        ctr_lookup = {
-            "display": 0.01,
-            "social_media": 0.05,
-            "email": 0.12,
-            "search": 0.08
-        }
-        ctr = ctr_lookup[campaign_channel]
-        clicks = min(impressions, max(0, int(np.random.binomial(impressions, ctr))))
-
-        # Website visits: 60–85% of clicks
-        if clicks == 0:
-            website_visits = 0
-        else:
-            website_visits = sum(1 for _ in range(clicks) if random.random() < random.uniform(0.6, 0.85))
-
-        # Time on site (seconds) if there are visits
-        time_on_site = 0 if website_visits == 0 else random.randint(60, 600)
-
-        # Conversions: 3% chance if there are visits
-        conversions = 0
-        if website_visits > 0:
-            if random.random() < 0.03:
-                conversions = random.choices([1, 2], weights=[0.85, 0.15])[0]
-
-        # Revenue based on conversions and ticket value
-        revenue = conversions * random.choice(REVENUE_VALUES)
-
-        # Previous purchases
-        previous_purchases = random.randint(0, 2)
-
-        # Ad spend based on channel
-        if campaign_channel == "email":
-            ad_spend = round(impressions * COST_PER_EMAIL, 2)
-        elif campaign_channel == "search":
-            ad_spend = round(clicks * CPC_SEARCH, 2)
-        else:  # social_media and display
-            ad_spend = round((impressions / 1000) * CPM_SOCIAL_DISPLAY, 2)
-
-        # Dates
-        date_received = fake.date_time_between(start_date=DATE_START, end_date=DATE_END)
-        extraction_date = datetime.now()
-
-        data.append({
-            "customer_id": customer_id,
-            "age": age,
-            "gender": gender,
-            "income": income,
-            "campaign_id": campaign_id,
-            "campaign_channel": campaign_channel,
-            "campaign_type": campaign_type,
-            "ad_spend": ad_spend,
-            "impressions": impressions,
-            "clicks": clicks,
-            "conversions": conversions,
-            "revenue": revenue,
-            "website_visits": website_visits,
-            "time_on_site": time_on_site,
-            "previous_purchases": previous_purchases,
-            "date_received": date_received,
-            "advertising_platform": advertising_platform,
-            "extraction_date": extraction_date,
-        })
-
-    # Create DataFrame and save
-    df = pd.DataFrame(data)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    workers = (os.cpu_count() or 1) if num_customers >= PARALLEL_MIN_ROWS else 1
+    base, extra = divmod(num_customers, workers)
+    chunk_sizes = [base + (i < extra) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+
+    if workers == 1:
+        df = _gen_chunk(num_customers, seeds[0])
+    else:
+        logger.info(f"Sharding generation across {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_gen_chunk, chunk_sizes, seeds))
+        df = pd.concat(parts, ignore_index=True, copy=False)
+    extraction_date = pd.Timestamp.now()
+    df["extraction_date"] = extraction_date
+
+    timestamp = extraction_date.strftime("%Y%m%d_%H%M%S")
     logger.info(f"Saving data with timestamp {timestamp}...")
 
     try:
         os.makedirs(output_dir, exist_ok=True)
+        # Convert once; both writers serialize the same Arrow table
+        table = pa.Table.from_pandas(df, preserve_index=False)
         # Save as Parquet
         parquet_path = os.path.join(output_dir, f"marketing_{timestamp}.parquet")
-        df.to_parquet(parquet_path, index=False)
+        pq.write_table(table, parquet_path, **PARQUET_WRITE_OPTIONS)
         logger.info(f"Data saved to {parquet_path}")
         # Save as CSV
-        csv_path = os.path.join(output_dir, f"marketing_{timestamp}.csv")
-        df.to_csv(csv_path, index=False)
-        logger.info(f"Data saved to {csv_path}")
+        if WRITE_CSV:
+            csv_path = os.path.join(output_dir, f"marketing_{timestamp}.csv")
+            pacsv.write_csv(table, csv_path)
+            logger.info(f"Data saved to {csv_path}")
     except OSError as e:
         logger.error(f"Failed to save data: {e}")
         raise
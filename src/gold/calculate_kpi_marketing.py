@@ -3,14 +3,20 @@ Calculate marketing KPIs for each record and save to the gold layer.
 
 This script processes cleaned data from the silver layer, calculates key performance
 indicators (KPIs) such as CTR, CVR, CPC, CPA, ROAS, and margin for each record, and
-saves the results in Parquet and CSV formats in the `data/gold` directory.
+saves the results in Parquet format (and CSV when `WRITE_CSV` is set) in the
+`data/gold` directory.
 """
 
 import logging
 import os
+from contextlib import ExitStack
 from datetime import datetime
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 # Configure logging
 logging.basicConfig(
@@ -22,46 +28,110 @@ logger = logging.getLogger(__name__)
 # Configuration constants
 INPUT_DIR = "data/silver"
 OUTPUT_DIR = "data/gold"
+WRITE_CSV = os.getenv("WRITE_CSV", "false").lower() in ("1", "true", "yes")  # CSV is opt-in
+
+# Records streamed per batch; each batch is written as one Parquet row group
+BATCH_SIZE = 64_000
+
+# Parquet write settings (zstd, dictionary-encoded strings)
+PARQUET_WRITE_OPTIONS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "data_page_size": 1 << 20,
+    "write_statistics": True,
+}
+
+# Columns read from the previous layer; extraction_date is skipped because it is
+# restamped on every run
+INPUT_COLUMNS = [
+    "customer_id",
+    "age",
+    "gender",
+    "income",
+    "campaign_id",
+    "campaign_channel",
+    "campaign_type",
+    "ad_spend",
+    "impressions",
+    "clicks",
+    "conversions",
+    "revenue",
+    "website_visits",
+    "time_on_site",
+    "previous_purchases",
+    "date_received",
+    "advertising_platform",
+]
+
+KPI_COLUMNS = ["ctr", "cvr", "cpc", "cpa", "roas", "margin"]
+
+pa.set_cpu_count(os.cpu_count() or 1)
 
 
 def get_latest_silver_file(input_dir: str) -> str:
-    """Retrieve the most recent Parquet file from the silver layer using datetime parsing."""
+    """Retrieve the most recent Parquet file from the silver layer in a single directory pass."""
     logger.info(f"Searching for the latest Parquet file in {input_dir}...")
-    
-    silver_files = [
-        f for f in os.listdir(input_dir)
-        if f.startswith("marketing") and f.endswith(".parquet")
-    ]
-    if not silver_files:
+
+    # marketing_YYYYmmdd_HHMMSS.parquet -> YYYYmmddHHMMSS compares as an integer;
+    # the older minute-resolution names (YYYYmmdd_HHMM) are padded to seconds
+    latest_file, latest_key = None, -1
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not (name.startswith("marketing_") and name.endswith(".parquet")):
+                continue
+            stamp = name[len("marketing_"):-len(".parquet")].strip()
+            digits = stamp.replace("_", "")
+            if len(stamp) not in (13, 15) or stamp[8] != "_" or not digits.isdigit():
+                logger.error(f"Failed to parse timestamp from filename '{name}'")
+                raise ValueError(f"Unexpected timestamp in filename '{name}'")
+            key = int(digits.ljust(14, "0"))
+            if key > latest_key:
+                latest_file, latest_key = entry.path, key
+
+    if latest_file is None:
         logger.error("No Parquet files found in the silver layer.")
         raise FileNotFoundError("No Parquet files found in the silver layer.")
 
-    def extract_datetime(filename: str) -> datetime:
-        try:
-            # Remove prefix e extensão
-            timestamp_str = filename.replace("marketing_", "").replace(".parquet", "").strip()
-            # Tenta converter para datetime
-            return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-        except ValueError:
-            # Caso não bata o formato exato, tenta com outros formatos possíveis
-            for fmt in ["%Y%m%d_%H%M%S", "%Y%m%d_%H%M"]:
-                try:
-                    return datetime.strptime(timestamp_str, fmt)
-                except ValueError:
-                    continue
-            logger.error(f"Failed to parse timestamp from filename '{filename}'")
-            raise
-
-    # Ordena pelo timestamp extraído, mais recente primeiro
-    silver_files.sort(key=extract_datetime, reverse=True)
-
-    latest_file = os.path.join(input_dir, silver_files[0])
     logger.info(f"Latest file found: {latest_file}")
     return latest_file
 
+def _safe_ratio(numerator: pa.Array, denominator: pa.Array, scale: float = 1) -> pa.Array:
+    """Divide element-wise, scale and round to 2 decimals, using 0 where the denominator is 0."""
+    ratio = pc.divide(numerator, denominator)
+    if scale != 1:
+        ratio = pc.multiply(ratio, pa.scalar(scale, pa.float32()))
+    ratio = pc.if_else(pc.equal(denominator, 0), pa.scalar(0, pa.float32()), ratio)
+    return pc.fill_null(pc.round(ratio, 2), 0)
+
+def _add_kpis(
+    batch: pa.RecordBatch, schema: pa.Schema, extraction_date: pa.Scalar
+) -> pa.RecordBatch:
+    """Append the KPI columns and the processing timestamp to a batch of silver records."""
+    impressions, clicks, conversions, ad_spend, revenue = (
+        pc.cast(batch.column(name), pa.float32())
+        for name in ("impressions", "clicks", "conversions", "ad_spend", "revenue")
+    )
+    kpis = [
+        _safe_ratio(clicks, impressions, 100),  # Click-through rate (%)
+        _safe_ratio(conversions, clicks, 100),  # Conversion rate (%)
+        _safe_ratio(ad_spend, clicks),  # Cost per click
+        _safe_ratio(ad_spend, conversions),  # Cost per acquisition
+        _safe_ratio(revenue, ad_spend),  # Return on ad spend
+        _safe_ratio(pc.subtract(revenue, ad_spend), revenue, 100),  # Profit margin (%)
+    ]
+    return pa.RecordBatch.from_arrays(
+        batch.columns + kpis + [pa.repeat(extraction_date, batch.num_rows)], schema=schema
+    )
+
 def calculate_metrics(input_path: str, output_dir: str) -> None:
     """Calculate marketing KPIs for each record and save to the gold layer.
 
+    Silver records are streamed through the KPI computation in Arrow record
+    batches and appended to the output files, so memory stays bounded by the
+    batch size rather than the dataset size.
+
     Args:
         input_path (str): Path to the input Parquet file from the silver layer.
         output_dir (str): Directory to save the processed files.
@@ -72,54 +142,54 @@ def calculate_metrics(input_path: str, output_dir: str) -> None:
     """
     logger.info(f"Processing data from {input_path}...")
 
-    # Read cleaned data
+    # Open cleaned data
     try:
-        df = pd.read_parquet(input_path)
-        logger.info(f"Loaded {len(df)} records from {input_path}")
+        dataset = ds.dataset(input_path, format="parquet")
     except FileNotFoundError as e:
         logger.error(f"Input file not found: {e}")
         raise
 
-    # Calculate KPIs for each record
-    df["ctr"] = (df["clicks"] / df["impressions"] * 100).round(2)  # Click-through rate (%)
-    df["cvr"] = (df["conversions"] / df["clicks"] * 100).round(2)  # Conversion rate (%)
-    df["cpc"] = (df["ad_spend"] / df["clicks"]).round(2)  # Cost per click
-    df["cpa"] = (df["ad_spend"] / df["conversions"]).round(2)  # Cost per acquisition
-    df["roas"] = (df["revenue"] / df["ad_spend"]).round(2)  # Return on ad spend
-    df["margin"] = (
-        ((df["revenue"] - df["ad_spend"]) / df["revenue"] * 100)
-    ).round(2)  # Profit margin (%)
-
-    # Handle infinite and null values
-    for col in ["ctr", "cvr", "cpc", "cpa", "roas", "margin"]:
-        df[col] = df[col].replace([float("inf"), -float("inf")], 0).fillna(0)
-    logger.info("KPIs calculated and null/infinite values handled.")
-
-    # Add processing timestamp
-    df["extraction_date"] = datetime.now()
-    logger.info("Added processing timestamp.")
-
-    # Generate output filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    schema = pa.schema(
+        [dataset.schema.field(name) for name in INPUT_COLUMNS]
+        + [pa.field(name, pa.float32()) for name in KPI_COLUMNS]
+        + [pa.field("extraction_date", pa.timestamp("us"))]
+    )
+
+    # Processing timestamp, shared by every batch and the output filename
+    extraction_date = datetime.now()
+    extraction_date_scalar = pa.scalar(extraction_date, type=pa.timestamp("us"))
+    timestamp = extraction_date.strftime("%Y%m%d_%H%M%S")
     base_filename = f"marketing_metrics_{timestamp}"
+    parquet_path = os.path.join(output_dir, f"{base_filename}.parquet")
+    csv_path = os.path.join(output_dir, f"{base_filename}.csv")
 
-    # Save as Parquet
+    # Calculate KPIs batch by batch and save as Parquet (and CSV)
+    num_records = 0
     try:
-        parquet_path = os.path.join(output_dir, f"{base_filename}.parquet")
-        df.to_parquet(parquet_path, index=False)
-        logger.info(f"Data saved to {parquet_path}")
+        with ExitStack() as stack:
+            parquet_writer = stack.enter_context(
+                pq.ParquetWriter(parquet_path, schema, **PARQUET_WRITE_OPTIONS)
+            )
+            csv_writer = None
+            if WRITE_CSV:
+                csv_writer = stack.enter_context(pacsv.CSVWriter(csv_path, schema))
+            batches = dataset.to_batches(
+                columns=INPUT_COLUMNS, batch_size=BATCH_SIZE, use_threads=True
+            )
+            for batch in batches:
+                batch = _add_kpis(batch, schema, extraction_date_scalar)
+                parquet_writer.write_batch(batch, row_group_size=BATCH_SIZE)
+                if csv_writer is not None:
+                    csv_writer.write_batch(batch)
+                num_records += batch.num_rows
     except OSError as e:
-        logger.error(f"Failed to save Parquet file: {e}")
+        logger.error(f"Failed to save output files: {e}")
         raise
 
-    # Save as CSV
-    try:
-        csv_path = os.path.join(output_dir, f"{base_filename}.csv")
-        df.to_csv(csv_path, index=False)
+    logger.info(f"KPIs calculated for {num_records} records and null/infinite values handled.")
+    logger.info(f"Data saved to {parquet_path}")
+    if WRITE_CSV:
         logger.info(f"Data saved to {csv_path}")
-    except OSError as e:
-        logger.error(f"Failed to save CSV file: {e}")
-        raise
 
 
 if __name__ == "__main__":